@@ -1,10 +1,13 @@
-from deepface import DeepFace
+import time
+
+IMPORT_START = time.perf_counter()
+
 import cv2
 import os
-import time
 import threading
 from datetime import datetime
 
+from frame_scheduler import FrameScheduler
 from database_operations import (
     init_database, 
     save_test_results, 
@@ -15,13 +18,65 @@ from database_operations import (
     get_failed_tests_stats 
 )
 
-camera_is_busy = False
+MODULE_IMPORT_TIME = time.perf_counter() - IMPORT_START
+
+# "fixed" samples at TARGET_FPS, "adaptive" paces frames from measured
+# recognition time so workers stay busy about half the time
+SCHEDULER_POLICY = "adaptive"
+TARGET_FPS = 3.0
+
+face_in_view = False
 current_frame = None
 frame_lock = threading.Lock()
+# Guards the counters below; a boost can run two check_face threads at once
+stats_lock = threading.Lock()
 last_detected_person = None
 total_attempts = successful_recognitions = 0
 processing_times = []
 confidence_scores = []
+first_recognition_reported = False
+camera_opened_at = None
+startup_timings = {}
+_deepface = None
+
+def get_deepface():
+    """Import DeepFace (and TensorFlow with it) on first use only"""
+    global _deepface
+    if _deepface is None:
+        import_start = time.perf_counter()
+        from deepface import DeepFace
+        _deepface = DeepFace
+        startup_timings['DeepFace import'] = time.perf_counter() - import_start
+    return _deepface
+
+def start_database_init():
+    """Run init_database in the background so it overlaps with model loading"""
+    outcome = {'ok': False, 'messages': [], 'reported': False}
+
+    def run():
+        init_start = time.perf_counter()
+        try:
+            # Collected rather than printed so output doesn't land in the prompts
+            outcome['ok'] = init_database(log=outcome['messages'].append)
+        except Exception as e:
+            outcome['messages'].append(f"Error initializing database: {str(e)}")
+        outcome['duration'] = time.perf_counter() - init_start
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, outcome
+
+def finish_database_init(thread, outcome):
+    """Wait for the background database init and print what it reported"""
+    wait_start = time.perf_counter()
+    thread.join()
+    if not outcome['reported']:
+        outcome['reported'] = True
+        for message in outcome['messages']:
+            print(message)
+        startup_timings['Database init'] = outcome['duration']
+        startup_timings['Database init wait'] = time.perf_counter() - wait_start
+    return outcome['ok']
 
 def get_model_choice():
     while True:
@@ -45,22 +100,21 @@ def get_model_choice():
             print("Please enter a valid number between 1 and 3")
 
 def calculate_averages():
-    avg_rate = (successful_recognitions / total_attempts * 100) if total_attempts > 0 else 0
-    avg_time = sum(processing_times) / len(processing_times) if processing_times else 0
-    avg_conf = sum(confidence_scores) / len(confidence_scores) if confidence_scores else 0
-    return {
-        'avg_rate': avg_rate,
-        'avg_time': avg_time,
-        'avg_confidence': avg_conf,
-        'total_attempts': total_attempts,
-        'successful_recognitions': successful_recognitions
-    }
+    with stats_lock:
+        avg_rate = (successful_recognitions / total_attempts * 100) if total_attempts > 0 else 0
+        avg_time = sum(processing_times) / len(processing_times) if processing_times else 0
+        avg_conf = sum(confidence_scores) / len(confidence_scores) if confidence_scores else 0
+        return {
+            'avg_rate': avg_rate,
+            'avg_time': avg_time,
+            'avg_confidence': avg_conf,
+            'total_attempts': total_attempts,
+            'successful_recognitions': successful_recognitions
+        }
 
-def check_face(frame, model, expected_name):
-    global camera_is_busy, current_frame, total_attempts, successful_recognitions, last_detected_person
-    if camera_is_busy:
-        return
-    camera_is_busy = True
+def check_face(frame, model, expected_name, scheduler):
+    global face_in_view, current_frame, total_attempts, successful_recognitions, last_detected_person
+    task_start = time.time()
     
     try:
        
@@ -69,12 +123,21 @@ def check_face(frame, model, expected_name):
                    cv2.FONT_HERSHEY_DUPLEX, 0.8, (255,255,255), 2)
         
        
+        DeepFace = get_deepface()
         start_time = time.time()
         face_objs = DeepFace.extract_faces(frame, detector_backend="mtcnn", enforce_detection=False)
         
+        # Sample faster for a moment when a face first comes into view
+        with stats_lock:
+            new_face = len(face_objs) > 0 and not face_in_view
+            face_in_view = len(face_objs) > 0
+        if new_face:
+            scheduler.boost()
+        
         if len(face_objs) > 0:  # If face is detected then
             # Process detected face
-            total_attempts += 1
+            with stats_lock:
+                total_attempts += 1
             facial_area = face_objs[0]['facial_area']
             x, y, w, h = facial_area['x'], facial_area['y'], facial_area['w'], facial_area['h']
             
@@ -83,7 +146,8 @@ def check_face(frame, model, expected_name):
                                  enforce_detection=False, detector_backend="mtcnn",
                                  distance_metric="cosine", silent=True)
             
-            processing_times.append(time.time() - start_time)
+            with stats_lock:
+                processing_times.append(time.time() - start_time)
             
             # Handle all match scenarios
             if len(result[0]['identity'].values) > 0:
@@ -109,7 +173,7 @@ def check_face(frame, model, expected_name):
     except Exception as e:
         print(f"Error: {str(e)}")
     finally:
-        camera_is_busy = False  
+        scheduler.task_done(time.time() - task_start)
 
 def draw_box(frame, x, y, w, h, text, color):
     """Helper function to draw bounding box and text"""
@@ -119,10 +183,15 @@ def draw_box(frame, x, y, w, h, text, color):
 
 def handle_successful_match(frame, x, y, w, h, person, match_score):
     """Handle successful face recognition"""
-    global successful_recognitions, last_detected_person
-    successful_recognitions += 1
-    confidence_scores.append(match_score)
-    last_detected_person = person
+    global successful_recognitions, last_detected_person, first_recognition_reported
+    with stats_lock:
+        successful_recognitions += 1
+        confidence_scores.append(match_score)
+        last_detected_person = person
+        first_recognition = not first_recognition_reported
+        first_recognition_reported = True
+    if first_recognition:
+        print(f"Time to first recognition: {time.perf_counter() - camera_opened_at:.2f} seconds after camera opened")
     draw_box(frame, x, y, w, h, f"{person} ({match_score:.1%})", (0,255,0))
     print(f"Recognized {person} with confidence: {match_score:.1%}")
 
@@ -155,6 +224,18 @@ def display_historical_stats(historical_stats):
         print(f"Overall Confidence: {stat['overall_confidence']:.2%}")
         print("-" * 50)
 
+def display_scheduler_stats(stats):
+    """Display frame sampling statistics"""
+    print("\nFrame Sampling:")
+    print("-" * 50)
+    print(f"Policy: {stats['policy']}")
+    print(f"Frames Recognized: {stats['completed']} of {stats['dispatched']} dispatched")
+    print(f"Achieved Recognition FPS: {stats['recognition_fps']:.2f}")
+    print(f"Average Recognition Latency: {stats['avg_latency']:.3f} seconds")
+    print(f"Worker Utilization: {stats['worker_utilization']:.1f}%")
+    print(f"CPU Utilization: {stats['cpu_percent']:.1f}%")
+    print("-" * 50)
+
 def warm_up_system(model):
     """Pre-initialize the system before actual testing"""
     print("\nInitializing face recognition system...")
@@ -166,6 +247,7 @@ def warm_up_system(model):
             raise Exception("No image files found in face_photos directory")
             
         sample_img = cv2.imread(os.path.join("face_photos", image_files[0]))
+        DeepFace = get_deepface()
         start_time = time.time()
         
         # Warm up DeepFace
@@ -176,16 +258,28 @@ def warm_up_system(model):
                      distance_metric="cosine", 
                      silent=True)
         
-        print(f"System initialized successfully! (Took {time.time() - start_time:.2f} seconds)")
+        startup_timings['Warm-up'] = time.time() - start_time
+        print(f"System initialized successfully! (Took {startup_timings['Warm-up']:.2f} seconds)")
         return True
     except Exception as e:
         print(f"Initialization error: {str(e)}")
         return False
 
+def display_startup_timings():
+    """Display how long each startup stage took, excluding time spent at prompts"""
+    print("\nStartup Timings:")
+    print("-" * 50)
+    for stage, seconds in startup_timings.items():
+        print(f"{stage}: {seconds:.2f} seconds")
+    print("-" * 50)
+
 def main():
+    global camera_opened_at
+    camera = None
+    startup_timings['Module imports'] = MODULE_IMPORT_TIME
     try:
        
-        init_database()
+        db_thread, db_outcome = start_database_init()
         
     
         model = get_model_choice()
@@ -201,13 +295,28 @@ def main():
             print("Name is required")
             return
         
+        # Fail fast if the database is already known to be unavailable
+        if not db_thread.is_alive() and not finish_database_init(db_thread, db_outcome):
+            print("Failed to initialize database. Please check DB_CONFIG.")
+            return
+        
         if not warm_up_system(model):
             print("Failed to initialize system. Please try again.")
             return
         
+        if not finish_database_init(db_thread, db_outcome):
+            print("Failed to initialize database. Please check DB_CONFIG.")
+            return
+        
+        camera_start = time.perf_counter()
         camera = cv2.VideoCapture(0)
         camera.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
         camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+        camera_opened_at = time.perf_counter()
+        startup_timings['Camera open'] = camera_opened_at - camera_start
+        display_startup_timings()
+        
+        scheduler = FrameScheduler(policy=SCHEDULER_POLICY, target_fps=TARGET_FPS)
         
         print("\nRunning face recognition for 15 seconds...")
         start_time = time.time()
@@ -217,13 +326,15 @@ def main():
             if not success:
                 break
             
-            if time.time() % 0.3 < 0.1:
-                threading.Thread(target=check_face, args=(frame.copy(), model, participant_name)).start()
+            if scheduler.should_process():
+                threading.Thread(target=check_face, args=(frame.copy(), model, participant_name, scheduler)).start()
             
             cv2.imshow('Face Recognition', current_frame if current_frame is not None else frame)
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 break
         
+        display_scheduler_stats(scheduler.stats())
+        
         if total_attempts > 0 and last_detected_person and successful_recognitions > 0:
             if last_detected_person != participant_name:
                 print(f"\nSystem incorrectly identified you as {last_detected_person}")
@@ -262,7 +373,8 @@ def main():
         print(f"An error occurred: {str(e)}")
     
     finally:
-        camera.release()
+        if camera is not None:
+            camera.release()
         cv2.destroyAllWindows()
 
 if __name__ == "__main__":
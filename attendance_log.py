@@ -0,0 +1,188 @@
+import csv
+import os
+import re
+import threading
+from datetime import datetime
+
+# Matches attendance.session_key VARCHAR(50) in database_operations
+SESSION_KEY_MAX_LENGTH = 50
+
+
+class AttendanceLog:
+    """Buffered attendance writer with a persisted dedup index.
+
+    Records are kept in memory and appended to the CSV in batches by a
+    background thread, either every flush_interval seconds or as soon as
+    max_buffer records are waiting. Names that have been written are also
+    appended to a small .idx file next to the CSV, so a restart picks up
+    where the previous run stopped instead of recording people twice.
+
+    rotation="day" writes one file per calendar day. rotation="session"
+    writes one file per session_key (e.g. a lecture id), so a run restarted
+    with the same key reuses the same file and index. With mirror_to_db=True
+    every flushed batch is also stored in PostgreSQL through
+    database_operations. A batch that fails is retried on later flushes, up
+    to max_mirror_attempts times, without holding back newer batches.
+    """
+
+    def __init__(self, directory=".", rotation="day", session_key=None,
+                 flush_interval=2.0, max_buffer=200, mirror_to_db=False,
+                 max_mirror_attempts=5):
+        if rotation not in ("day", "session"):
+            raise ValueError("rotation must be 'day' or 'session'")
+        if rotation == "session" and not session_key:
+            raise ValueError("session rotation needs a session_key")
+        if session_key and not re.fullmatch(r"[\w.-]+", session_key):
+            raise ValueError("session_key may only contain letters, digits, '_', '-' and '.'")
+        if session_key and len(session_key) > SESSION_KEY_MAX_LENGTH:
+            raise ValueError(f"session_key must be at most {SESSION_KEY_MAX_LENGTH} characters")
+
+        self.directory = directory
+        self.rotation = rotation
+        self.session_key = session_key
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.mirror_to_db = mirror_to_db
+        self.max_mirror_attempts = max_mirror_attempts
+
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.unmirrored = []  # [records, failed attempts] written to CSV but not the database
+        self.recorded_names = set()
+        self.current_key = None
+
+        os.makedirs(directory, exist_ok=True)
+        self._rotate(self._file_key(datetime.now()))
+
+        self.wake_up = threading.Event()
+        self.stopping = False
+        self.flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self.flush_thread.start()
+
+    def _file_key(self, timestamp):
+        if self.rotation == "session":
+            return self.session_key
+        return timestamp.strftime("%Y-%m-%d")
+
+    def csv_path(self, key=None):
+        return os.path.join(self.directory, f"attendance_{key or self.current_key}.csv")
+
+    def index_path(self, key=None):
+        return os.path.join(self.directory, f"attendance_{key or self.current_key}.idx")
+
+    def _load_index(self, key):
+        """Read names already recorded for this file, rebuilding from the CSV if needed"""
+        names = set()
+        if os.path.exists(self.index_path(key)):
+            with open(self.index_path(key)) as f:
+                names.update(line.strip() for line in f if line.strip())
+        elif os.path.exists(self.csv_path(key)):
+            with open(self.csv_path(key), newline='') as f:
+                reader = csv.reader(f)
+                next(reader, None)
+                names.update(row[0] for row in reader if row)
+            with open(self.index_path(key), 'w') as f:
+                f.writelines(f"{name}\n" for name in sorted(names))
+        return names
+
+    def _rotate(self, key):
+        """Switch to a new output file; caller must hold the lock or be __init__"""
+        self.current_key = key
+        self.recorded_names = self._load_index(key)
+
+    def record(self, name):
+        """Queue an attendance record; returns False if name is already recorded"""
+        timestamp = datetime.now()
+        with self.lock:
+            key = self._file_key(timestamp)
+            if key != self.current_key:
+                self._write_buffer()
+                self._rotate(key)
+                self.wake_up.set()
+
+            if name in self.recorded_names:
+                return False
+
+            self.recorded_names.add(name)
+            self.buffer.append((name, timestamp))
+            if len(self.buffer) >= self.max_buffer:
+                self.wake_up.set()
+            return True
+
+    def _write_buffer(self):
+        """Append buffered rows and their names to disk; caller must hold the lock"""
+        if not self.buffer:
+            return
+
+        batch, self.buffer = self.buffer, []
+        csv_path = self.csv_path()
+        write_header = not os.path.exists(csv_path)
+
+        with open(csv_path, 'a', newline='') as f:
+            writer = csv.writer(f)
+            if write_header:
+                writer.writerow(['Name', 'Date', 'Time'])
+            writer.writerows([name, ts.strftime("%Y-%m-%d"), ts.strftime("%H:%M:%S")]
+                             for name, ts in batch)
+
+        # Written after the CSV so a crash in between can't hide a missing row
+        with open(self.index_path(), 'a') as f:
+            f.writelines(f"{name}\n" for name, _ in batch)
+
+        if self.mirror_to_db:
+            self.unmirrored.append([[(name, ts, self.current_key) for name, ts in batch], 0])
+
+    def _mirror(self):
+        """Save written batches to the database, keeping failed ones for a limited retry"""
+        if not self.mirror_to_db:
+            return
+        with self.lock:
+            pending, self.unmirrored = self.unmirrored, []
+        if not pending:
+            return
+
+        from database_operations import save_attendance_records
+        retry = []
+        for records, attempts in pending:
+            if save_attendance_records(records):
+                continue
+            attempts += 1
+            if attempts >= self.max_mirror_attempts:
+                print(f"Giving up on mirroring {len(records)} attendance records to database "
+                      f"after {attempts} attempts; they are still in the CSV")
+            else:
+                print(f"Failed to mirror {len(records)} attendance records to database, will retry")
+                retry.append([records, attempts])
+
+        with self.lock:
+            self.unmirrored = retry + self.unmirrored
+
+    def unmirrored_count(self):
+        """Number of records written to CSV but still waiting for the database"""
+        with self.lock:
+            return sum(len(records) for records, _ in self.unmirrored)
+
+    def flush(self):
+        """Write any buffered records now"""
+        with self.lock:
+            self._write_buffer()
+        self._mirror()
+
+    def _flush_loop(self):
+        while not self.stopping:
+            self.wake_up.wait(self.flush_interval)
+            self.wake_up.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error writing attendance: {str(e)}")
+
+    def close(self):
+        """Stop the background thread and write whatever is left"""
+        self.stopping = True
+        self.wake_up.set()
+        self.flush_thread.join()
+        self.flush()
+        if self.unmirrored:
+            print(f"{self.unmirrored_count()} attendance records were saved to CSV "
+                  f"but not to the database")
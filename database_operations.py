@@ -1,5 +1,3 @@
-import psycopg2
-from psycopg2.extras import DictCursor
 from datetime import datetime
 
 
@@ -11,12 +9,25 @@ DB_CONFIG = {
     'port': '5050'
 }
 
-def create_database():
+_psycopg2 = None
+
+def get_driver():
+    """Import psycopg2 on first use so importing this module stays cheap"""
+    global _psycopg2
+    if _psycopg2 is None:
+        import psycopg2
+        import psycopg2.extras
+        _psycopg2 = psycopg2
+    return _psycopg2
+
+def create_database(log=print):
     """Create database and schema if they don't exist"""
     temp_config = DB_CONFIG.copy()
     temp_config['dbname'] = 'postgres'
+    conn = None
     
     try:
+        psycopg2 = get_driver()
         conn = psycopg2.connect(**temp_config)
         conn.autocommit = True
         cur = conn.cursor()
@@ -28,7 +39,7 @@ def create_database():
         
         if not exists:
             cur.execute(f"CREATE DATABASE {DB_CONFIG['dbname']}")
-            print(f"Database '{DB_CONFIG['dbname']}' created successfully")
+            log(f"Database '{DB_CONFIG['dbname']}' created successfully")
             
         # Connect to the database and create schema
         conn.close()
@@ -42,18 +53,21 @@ def create_database():
             GRANT ALL ON SCHEMA public TO postgres;
             GRANT ALL ON SCHEMA public TO public;
         """)
+        return True
         
     except Exception as e:
-        print(f"Error checking/creating database: {str(e)}")
+        log(f"Error checking/creating database: {str(e)}")
+        return False
     finally:
-        cur.close()
-        conn.close()
+        if conn is not None:
+            conn.close()
 
-def execute_query(query, params=None, fetch_all=False):
+def execute_query(query, params=None, fetch_all=False, log=print):
     """Execute a database query and return results"""
     try:
+        psycopg2 = get_driver()
         conn = psycopg2.connect(**DB_CONFIG)
-        cur = conn.cursor(cursor_factory=DictCursor)
+        cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         try:
             cur.execute(query, params or ())
             conn.commit()
@@ -64,16 +78,16 @@ def execute_query(query, params=None, fetch_all=False):
             return result
         except psycopg2.OperationalError as e:
             if "does not exist" in str(e):
-                create_database()
-                return execute_query(query, params, fetch_all)
-            print(f"Database error: {str(e)}")  
+                create_database(log)
+                return execute_query(query, params, fetch_all, log)
+            log(f"Database error: {str(e)}")  
             return None
         finally:
             cur.close()
             conn.close()
     except Exception as e:
         if "no results to fetch" not in str(e):
-            print(f"Database error: {str(e)}")
+            log(f"Database error: {str(e)}")
         return None
 
 
@@ -119,27 +133,37 @@ TABLES = {
             count INTEGER DEFAULT 0,
             last_updated TIMESTAMP NOT NULL
         )
+    """,
+    'attendance': """
+        CREATE TABLE IF NOT EXISTS attendance (
+            attendance_id SERIAL PRIMARY KEY,
+            person_id INTEGER REFERENCES people(person_id),
+            session_key VARCHAR(50) NOT NULL,
+            attended_at TIMESTAMP NOT NULL,
+            UNIQUE (person_id, session_key)
+        )
     """
 }
 
-def init_database():
+def init_database(log=print):
     """Initialize all database tables and default data"""
-    create_database()
+    if not create_database(log):
+        return False
     try:
         
         for table_name, create_statement in TABLES.items():
-            execute_query(create_statement)
+            execute_query(create_statement, log=log)
         
         
         execute_query("""
             INSERT INTO models (model_name)
             VALUES ('ArcFace'), ('Facenet'), ('Dlib')
             ON CONFLICT (model_name) DO NOTHING
-        """)
-        print("Database initialized successfully")
+        """, log=log)
+        log("Database initialized successfully")
         return True
     except Exception as e:
-        print(f"Error initializing database: {str(e)}")
+        log(f"Error initializing database: {str(e)}")
         return False
 
 def get_or_create_person(name):
@@ -289,4 +313,38 @@ def get_historical_aggregate_stats():
         FROM model_aggregate_stats mas
         JOIN models m ON mas.model_id = m.model_id
         ORDER BY m.model_name
-    """, fetch_all=True)
\ No newline at end of file
+    """, fetch_all=True)
+
+def save_attendance_records(records):
+    """Save a batch of (name, timestamp, session_key) attendance records"""
+    try:
+        if not records:
+            return True
+        names = sorted({name for name, _, _ in records})
+        # RETURNING with fetch_all gives [] on success and None on error
+        result = execute_query(
+            "INSERT INTO people (name) VALUES "
+            + ", ".join(["(%s)"] * len(names))
+            + " ON CONFLICT (name) DO NOTHING RETURNING person_id",
+            tuple(names),
+            fetch_all=True
+        )
+        if result is None:
+            return False
+        
+        params = []
+        for name, timestamp, session_key in records:
+            params.extend([name, timestamp, session_key])
+        result = execute_query("""
+            INSERT INTO attendance (person_id, attended_at, session_key)
+            SELECT p.person_id, v.attended_at, v.session_key
+            FROM (VALUES """ + ", ".join(["(%s, %s::timestamp, %s)"] * len(records)) + """)
+                AS v(name, attended_at, session_key)
+            JOIN people p ON p.name = v.name
+            ON CONFLICT (person_id, session_key) DO NOTHING
+            RETURNING attendance_id
+        """, tuple(params), fetch_all=True)
+        return result is not None
+    except Exception as e:
+        print(f"Error saving attendance records: {str(e)}")
+        return False
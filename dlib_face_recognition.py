@@ -1,10 +1,24 @@
 import face_recognition
 import cv2
 import numpy as np
-import csv
 from datetime import datetime
 import os
 
+from attendance_log import AttendanceLog
+from gallery_shards import ShardedGallery
+
+# "day" writes one attendance file per date, "session" one per lecture/session ID
+ATTENDANCE_ROTATION = "day"
+ATTENDANCE_FLUSH_INTERVAL = 2.0
+MIRROR_ATTENDANCE_TO_DB = False
+
+# Set GALLERY_SHARDS above 0 to split known faces across worker processes;
+# add ("host", port) pairs running gallery_shards.py for other nodes. Remote
+# shards need the shared key in the GALLERY_AUTHKEY environment variable.
+GALLERY_SHARDS = 0
+GALLERY_SHARD_ADDRESSES = []
+GALLERY_AUTHKEY = os.environ.get("GALLERY_AUTHKEY", "").encode() or None
+
 def load_known_faces(faces_dir="face_photos"):
     """Load face encodings from the photos directory"""
     if not os.path.exists(faces_dir):
@@ -39,25 +53,6 @@ def load_known_faces(faces_dir="face_photos"):
     
     return known_face_encodings, known_face_names
 
-def record_attendance(name, attendance_file):
-    """Record attendance in CSV file"""
-    timestamp = datetime.now()
-    date_str = timestamp.strftime("%Y-%m-%d")
-    time_str = timestamp.strftime("%H:%M:%S")
-    
-    # Create file with headers if it doesn't exist
-    if not os.path.exists(attendance_file):
-        with open(attendance_file, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['Name', 'Date', 'Time'])
-    
-    # Append attendance record
-    with open(attendance_file, 'a', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow([name, date_str, time_str])
-    
-    print(f"\nRecorded attendance for {name} at {time_str}")
-
 def main():
     # Load known faces
     known_face_encodings, known_face_names = load_known_faces()
@@ -72,6 +67,10 @@ def main():
     
     print(f"\nLoaded {len(known_face_names)} faces: {', '.join(known_face_names)}")
     
+    if GALLERY_SHARD_ADDRESSES and not GALLERY_AUTHKEY:
+        print("Error: set GALLERY_AUTHKEY to use remote gallery shards")
+        return
+    
     # Initialize video capture
     print("\nInitializing camera...")
     video_capture = cv2.VideoCapture(0)
@@ -80,78 +79,122 @@ def main():
         print("Error: Could not open camera")
         return
     
-    # Set up attendance file
-    attendance_file = f'attendance_{datetime.now().strftime("%Y-%m-%d")}.csv'
-    recorded_names = set()  # Track names already recorded
-    
-    print("\nFace Recognition System Ready")
-    print("Press 'q' to quit")
+    # Set up attendance log
+    session_key = None
+    if ATTENDANCE_ROTATION == "session":
+        # Reusing the same ID after a restart picks up the same attendance file
+        session_key = input("\nEnter lecture/session ID: ").strip()
+    if MIRROR_ATTENDANCE_TO_DB:
+        from database_operations import init_database
+        init_database()
+    try:
+        attendance_log = AttendanceLog(rotation=ATTENDANCE_ROTATION,
+                                       session_key=session_key,
+                                       flush_interval=ATTENDANCE_FLUSH_INTERVAL,
+                                       mirror_to_db=MIRROR_ATTENDANCE_TO_DB)
+    except ValueError as e:
+        print(f"Error: {str(e)}")
+        video_capture.release()
+        return
     
-    while True:
-        # Capture frame
-        ret, frame = video_capture.read()
-        if not ret:
-            print("Error: Could not read frame")
-            break
+    gallery = None
+    try:
+        # Built here so the finally block below always closes it
+        if GALLERY_SHARDS > 0 or GALLERY_SHARD_ADDRESSES:
+            gallery = ShardedGallery(GALLERY_SHARDS, GALLERY_SHARD_ADDRESSES, GALLERY_AUTHKEY)
+            gallery.add(known_face_names, known_face_encodings)
+            print(f"Split gallery across {len(gallery.shards)} shards")
+        
+        print("\nFace Recognition System Ready")
+        print("Press 'q' to quit")
         
-        # Find faces in frame
-        small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-        rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+        while True:
+            # Capture frame
+            ret, frame = video_capture.read()
+            if not ret:
+                print("Error: Could not read frame")
+                break
         
-        face_locations = face_recognition.face_locations(rgb_small_frame)
-        face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
+            # Find faces in frame
+            small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
+            rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
         
-        # Process each face in the frame
-        for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-            # Scale back up face locations
-            top *= 4
-            right *= 4
-            bottom *= 4
-            left *= 4
+            face_locations = face_recognition.face_locations(rgb_small_frame)
+            face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
+        
+            # Process each face in the frame
+            for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
+                # Scale back up face locations
+                top *= 4
+                right *= 4
+                bottom *= 4
+                left *= 4
+            
+                # Check if face matches any known faces
+                name = "Unknown"
+                confidence = 0
+                best_name = None
             
-            # Check if face matches any known faces
-            matches = face_recognition.compare_faces(known_face_encodings, face_encoding, tolerance=0.6)
-            name = "Unknown"
-            confidence = 0
+                if gallery is not None:
+                    # Closest match across all shards; empty if no shard answered
+                    results = gallery.search(face_encoding, k=1)
+                    if results:
+                        best_name, best_distance = results[0]
+                        is_match = best_distance <= 0.6
+                else:
+                    matches = face_recognition.compare_faces(known_face_encodings, face_encoding, tolerance=0.6)
+                    if True in matches:
+                        # Find best match
+                        face_distances = face_recognition.face_distance(known_face_encodings, face_encoding)
+                        best_match_index = np.argmin(face_distances)
+                        best_name = known_face_names[best_match_index]
+                        best_distance = face_distances[best_match_index]
+                        is_match = matches[best_match_index]
             
-            if True in matches:
-                # Find best match
-                face_distances = face_recognition.face_distance(known_face_encodings, face_encoding)
-                best_match_index = np.argmin(face_distances)
-                confidence = 1 - face_distances[best_match_index]
+                if best_name is not None:
+                    confidence = 1 - best_distance
                 
-                if matches[best_match_index] and confidence > 0.5:
-                    name = known_face_names[best_match_index]
+                    if is_match and confidence > 0.5:
+                        name = best_name
                     
-                    # Record attendance if not already recorded
-                    if name not in recorded_names:
-                        record_attendance(name, attendance_file)
-                        recorded_names.add(name)
+                        # Record attendance if not already recorded
+                        if attendance_log.record(name):
+                            print(f"\nRecorded attendance for {name} at {datetime.now().strftime('%H:%M:%S')}")
             
-            # Draw box and label
-            color = (0, 255, 0) if name != "Unknown" else (0, 0, 255)
+                # Draw box and label
+                color = (0, 255, 0) if name != "Unknown" else (0, 0, 255)
             
-            # Draw box around face
-            cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+                # Draw box around face
+                cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
             
-            # Draw label background
-            cv2.rectangle(frame, (left, bottom - 35), (right, bottom), color, cv2.FILLED)
+                # Draw label background
+                cv2.rectangle(frame, (left, bottom - 35), (right, bottom), color, cv2.FILLED)
             
-            # Add name and confidence
-            label = f"{name} ({confidence:.1%})" if name != "Unknown" else name
-            cv2.putText(frame, label, (left + 6, bottom - 6), 
-                       cv2.FONT_HERSHEY_DUPLEX, 0.6, (255, 255, 255), 1)
+                # Add name and confidence
+                label = f"{name} ({confidence:.1%})" if name != "Unknown" else name
+                cv2.putText(frame, label, (left + 6, bottom - 6), 
+                           cv2.FONT_HERSHEY_DUPLEX, 0.6, (255, 255, 255), 1)
         
-        # Display frame
-        cv2.imshow('Face Recognition System', frame)
+            # Display frame
+            cv2.imshow('Face Recognition System', frame)
         
-        # Check for quit command
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+            # Check for quit command
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
     
-    # Clean up
-    video_capture.release()
-    cv2.destroyAllWindows()
+    finally:
+        # Clean up, flushing buffered attendance even after an error or Ctrl-C
+        attendance_log.close()
+        print(f"\nAttendance saved to {attendance_log.csv_path()}")
+        if gallery is not None:
+            for stat in gallery.shard_stats():
+                status = "ok" if stat['healthy'] else "unhealthy"
+                print(f"Shard {stat['shard']} ({stat['address']}, {status}): {stat['identities']} identities, "
+                      f"{stat['queries']} queries, {stat['failures']} failures, "
+                      f"avg {stat['avg_latency'] * 1000:.1f} ms, max {stat['max_latency'] * 1000:.1f} ms")
+            gallery.close()
+        video_capture.release()
+        cv2.destroyAllWindows()
 
 if __name__ == "__main__":
     main()
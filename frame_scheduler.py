@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+
+
+class FrameScheduler:
+    """Decide which camera frames are sent for recognition.
+
+    policy="fixed" dispatches at target_fps. policy="adaptive" follows the
+    measured recognition latency so that workers are busy for roughly
+    target_utilization of the time: the rate is
+    target_utilization * workers / latency, slowed further while earlier
+    frames are still being processed, and kept between min_fps and max_fps.
+
+    At most max_in_flight recognitions run at once. Calling boost() (e.g.
+    when a new face appears) allows boost_workers extra concurrent
+    recognitions and at least boost_fps for boost_duration seconds.
+    """
+
+    def __init__(self, policy="adaptive", target_fps=3.0, min_fps=0.5, max_fps=10.0,
+                 max_in_flight=1, target_utilization=0.5, boost_workers=1,
+                 boost_fps=6.0, boost_duration=2.0):
+        if policy not in ("fixed", "adaptive"):
+            raise ValueError("policy must be 'fixed' or 'adaptive'")
+
+        self.policy = policy
+        self.target_fps = target_fps
+        self.min_fps = min_fps
+        self.max_fps = max_fps
+        self.max_in_flight = max_in_flight
+        self.target_utilization = target_utilization
+        self.boost_workers = boost_workers
+        self.boost_fps = boost_fps
+        self.boost_duration = boost_duration
+
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.dispatched = 0
+        self.completed = 0
+        self.skipped = 0
+        self.avg_latency = None
+        self.busy_time = 0.0
+        self.last_dispatch = 0.0
+        self.boost_started = 0.0
+        self.boost_until = 0.0
+        self.boost_time = 0.0  # Seconds spent in finished boost windows
+
+        self.start_time = time.perf_counter()
+        self.start_cpu = time.process_time()
+
+    def workers(self, now=None):
+        """Number of recognitions allowed to run at once right now"""
+        now = time.perf_counter() if now is None else now
+        if now < self.boost_until:
+            return self.max_in_flight + self.boost_workers
+        return self.max_in_flight
+
+    def current_interval(self, now=None):
+        """Seconds to wait between dispatches under the current policy"""
+        now = time.perf_counter() if now is None else now
+        workers = self.workers(now)
+
+        if self.policy == "adaptive" and self.avg_latency is not None:
+            rate = self.target_utilization * workers / max(self.avg_latency, 1e-6)
+            # Back off while earlier frames are still queued or running
+            rate /= 1 + self.in_flight
+            interval = 1 / min(max(rate, self.min_fps), self.max_fps)
+        else:
+            interval = 1 / self.target_fps
+
+        if now < self.boost_until:
+            interval = min(interval, 1 / self.boost_fps)
+        return interval
+
+    def should_process(self, now=None):
+        """Return True if this frame should be recognized; the caller must then call task_done"""
+        now = time.perf_counter() if now is None else now
+        with self.lock:
+            if self.in_flight >= self.workers(now):
+                self.skipped += 1
+                return False
+            if now - self.last_dispatch < self.current_interval(now):
+                return False
+            self.last_dispatch = now
+            self.in_flight += 1
+            self.dispatched += 1
+            return True
+
+    def task_done(self, latency):
+        """Report that a dispatched frame finished after latency seconds"""
+        with self.lock:
+            self.in_flight -= 1
+            self.completed += 1
+            self.busy_time += latency
+            if self.avg_latency is None:
+                self.avg_latency = latency
+            else:
+                self.avg_latency = 0.8 * self.avg_latency + 0.2 * latency
+
+    def boost(self, now=None):
+        """Temporarily sample faster with an extra worker, e.g. because a new face came into view"""
+        now = time.perf_counter() if now is None else now
+        with self.lock:
+            if now >= self.boost_until:
+                # Previous window is over; start a new one
+                self.boost_time += self.boost_until - self.boost_started
+                self.boost_started = now
+            self.boost_until = now + self.boost_duration
+
+    def boosted_seconds(self, now=None):
+        """Total time spent boosted so far"""
+        now = time.perf_counter() if now is None else now
+        return self.boost_time + max(0.0, min(now, self.boost_until) - self.boost_started)
+
+    def stats(self, now=None):
+        """Achieved recognition rate, worker and process CPU usage since creation"""
+        now = time.perf_counter() if now is None else now
+        elapsed = now - self.start_time
+        cpu_time = time.process_time() - self.start_cpu
+        with self.lock:
+            # Worker-seconds available, counting the extra boost workers only while boosted
+            capacity = elapsed * self.max_in_flight + self.boosted_seconds(now) * self.boost_workers
+            return {
+                'policy': self.policy,
+                'elapsed': elapsed,
+                'dispatched': self.dispatched,
+                'completed': self.completed,
+                'skipped_busy': self.skipped,
+                'recognition_fps': self.completed / elapsed if elapsed > 0 else 0,
+                'avg_latency': self.avg_latency or 0,
+                'worker_utilization': self.busy_time / capacity * 100 if capacity > 0 else 0,
+                'cpu_percent': cpu_time / elapsed / (os.cpu_count() or 1) * 100 if elapsed > 0 else 0
+            }
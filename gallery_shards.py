@@ -0,0 +1,351 @@
+import argparse
+import multiprocessing as mp
+from multiprocessing.connection import AuthenticationError, Client, Listener, wait
+import os
+import time
+
+import numpy as np
+
+
+class ShardError(Exception):
+    """Sent back by a shard when it could not carry out a request"""
+
+
+def check_shape(encoding, encodings):
+    if encoding.ndim != 1 or (encodings and encoding.shape != encodings[0].shape):
+        raise ValueError(f"encoding has shape {encoding.shape}, expected "
+                         f"{encodings[0].shape if encodings else 'a 1-D vector'}")
+
+
+def shard_worker(conn):
+    """Hold one shard of the gallery and answer requests until told to stop"""
+    names = []
+    encodings = []
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+
+        # A bad request gets an error reply instead of taking the shard down
+        try:
+            command, payload = message
+
+            if command == "add":
+                batch = [(name, np.asarray(encoding, dtype=np.float64)) for name, encoding in payload]
+                for _, encoding in batch:
+                    check_shape(encoding, encodings or [e for _, e in batch])
+                for name, encoding in batch:
+                    names.append(name)
+                    encodings.append(encoding)
+                reply = len(names)
+
+            elif command == "remove":
+                removed = [(n, e) for n, e in zip(names, encodings) if n in payload]
+                kept = [(n, e) for n, e in zip(names, encodings) if n not in payload]
+                names = [n for n, _ in kept]
+                encodings = [e for _, e in kept]
+                reply = removed
+
+            elif command == "search":
+                query, k = payload
+                query = np.asarray(query, dtype=np.float64)
+                if not encodings:
+                    reply = []
+                else:
+                    check_shape(query, encodings)
+                    distances = np.linalg.norm(np.stack(encodings) - query, axis=1)
+                    best = np.argsort(distances)[:k]
+                    reply = [(names[i], float(distances[i])) for i in best]
+
+            elif command == "stop":
+                conn.send(None)
+                break
+
+            else:
+                raise ValueError(f"unknown command {command!r}")
+        except Exception as e:
+            reply = ShardError(f"{type(e).__name__}: {e}")
+
+        conn.send(reply)
+
+    conn.close()
+
+
+def serve_shard(address, authkey, ready=None):
+    """Run a gallery shard on this machine, serving one gallery connection at a time.
+
+    Messages are pickled, so the port must only be reachable from a trusted
+    network, and an authkey is required.
+    """
+    if not authkey:
+        raise ValueError("serve_shard needs an authkey; set GALLERY_AUTHKEY")
+
+    with Listener(address, authkey=authkey) as listener:
+        print(f"Gallery shard listening on {listener.address}")
+        if ready is not None:
+            ready.set()
+        while True:
+            try:
+                conn = listener.accept()
+            except (AuthenticationError, EOFError, OSError) as e:
+                print(f"Rejected connection: {str(e)}")
+                continue
+            with conn:
+                shard_worker(conn)
+
+
+class ShardedGallery:
+    """Face gallery split across worker processes or remote nodes.
+
+    Each identity lives on exactly one shard. A search is sent to every
+    healthy shard at once, each shard returns its own top-k matches and the
+    results are merged into an overall top-k. A shard that drops its
+    connection or misses the timeout is marked unhealthy and skipped
+    from then on, so searches return partial results instead of failing.
+
+    New identities go to the least loaded shard, and rebalance() moves
+    identities so shard sizes differ by at most one (run automatically
+    after add() and add_shard()).
+
+    Local shards are started with multiprocessing; remote shards are
+    reached through multiprocessing.connection at the given addresses,
+    where serve_shard() must already be running with the same authkey.
+    """
+
+    def __init__(self, num_shards=2, addresses=(), authkey=None, timeout=2.0):
+        self.authkey = authkey
+        self.timeout = timeout
+        self.shards = []
+        self.locations = {}
+
+        try:
+            for _ in range(num_shards):
+                self.add_shard()
+            for address in addresses:
+                self.add_shard(address)
+        except Exception:
+            self.close()
+            raise
+
+    def add_shard(self, address=None):
+        """Start a local shard, or connect to a remote one, then rebalance"""
+        if address is None:
+            conn, child_conn = mp.Pipe()
+            process = mp.Process(target=shard_worker, args=(child_conn,), daemon=True)
+            process.start()
+            child_conn.close()
+        else:
+            if not self.authkey:
+                raise ValueError("Remote shards need an authkey; set GALLERY_AUTHKEY")
+            conn = Client(address, authkey=self.authkey)
+            process = None
+
+        self.shards.append({
+            'conn': conn,
+            'process': process,
+            'address': address or "local",
+            'healthy': True,
+            'identities': set(),
+            'queries': 0,
+            'failures': 0,
+            'total_latency': 0.0,
+            'max_latency': 0.0
+        })
+        self.rebalance()
+
+    def _healthy(self):
+        return [i for i, shard in enumerate(self.shards) if shard['healthy']]
+
+    def _mark_failed(self, index, reason):
+        shard = self.shards[index]
+        shard['failures'] += 1
+        if shard['healthy']:
+            shard['healthy'] = False
+            print(f"Gallery shard {index} ({shard['address']}) failed: {reason}; "
+                  f"{len(shard['identities'])} identities unavailable")
+
+    def _rejected(self, index, reply):
+        """Count an error reply from a shard that is still reachable"""
+        self.shards[index]['failures'] += 1
+        print(f"Gallery shard {index} ({self.shards[index]['address']}) rejected request: {reply}")
+
+    def _request(self, index, command, payload=None):
+        """Send one request to a shard; returns None on failure.
+
+        A shard that can't be reached or times out is marked unhealthy; one
+        that replies with a ShardError stays healthy.
+        """
+        conn = self.shards[index]['conn']
+        try:
+            conn.send((command, payload))
+            if not conn.poll(self.timeout):
+                self._mark_failed(index, "timed out")
+                return None
+            reply = conn.recv()
+        except (EOFError, OSError) as e:
+            self._mark_failed(index, str(e) or type(e).__name__)
+            return None
+        if isinstance(reply, ShardError):
+            self._rejected(index, reply)
+            return None
+        return reply
+
+    def _forget(self, index, names):
+        """Drop names from the bookkeeping once no shard holds them"""
+        for name in names:
+            self.shards[index]['identities'].discard(name)
+            if self.locations.get(name) == index:
+                del self.locations[name]
+
+    def add(self, names, encodings):
+        """Add face encodings; each name is placed on the least loaded healthy shard"""
+        healthy = self._healthy()
+        if not healthy:
+            raise RuntimeError("No healthy gallery shards")
+
+        batches = {}
+        placed = set()
+        for name, encoding in zip(names, encodings):
+            if name in self.locations and self.shards[self.locations[name]]['healthy']:
+                index = self.locations[name]
+            else:
+                index = min(healthy, key=lambda i: len(self.shards[i]['identities']))
+                self.locations[name] = index
+                self.shards[index]['identities'].add(name)
+                placed.add(name)
+            batches.setdefault(index, []).append((name, encoding))
+
+        retry = []
+        for index, batch in batches.items():
+            if self._request(index, "add", batch) is not None:
+                continue
+            batch_names = {name for name, _ in batch}
+            if self.shards[index]['healthy']:
+                # Rejected; names the shard already held are still there
+                self._forget(index, batch_names & placed)
+            else:
+                # The shard went away; place these identities elsewhere
+                self._forget(index, batch_names)
+                retry.extend(batch)
+
+        if retry and self._healthy():
+            self.add([name for name, _ in retry], [encoding for _, encoding in retry])
+        else:
+            self.rebalance()
+
+    def rebalance(self):
+        """Move identities from the largest to the smallest healthy shard until sizes are even"""
+        while len(self._healthy()) > 1:
+            healthy = self._healthy()
+            largest = max(healthy, key=lambda i: len(self.shards[i]['identities']))
+            smallest = min(healthy, key=lambda i: len(self.shards[i]['identities']))
+            difference = len(self.shards[largest]['identities']) - len(self.shards[smallest]['identities'])
+            if difference <= 1:
+                break
+
+            moving = sorted(self.shards[largest]['identities'])[:difference // 2]
+            removed = self._request(largest, "remove", set(moving))
+            if removed is None:
+                if self.shards[largest]['healthy']:
+                    break
+                continue
+            if self._request(smallest, "add", removed) is None:
+                # Put the encodings back where they came from, or forget them if that fails too
+                if self._request(largest, "add", removed) is None:
+                    self._forget(largest, moving)
+                if self.shards[smallest]['healthy'] and self.shards[largest]['healthy']:
+                    break
+                continue
+
+            for name in moving:
+                self.shards[largest]['identities'].discard(name)
+                self.shards[smallest]['identities'].add(name)
+                self.locations[name] = smallest
+
+    def search(self, encoding, k=1):
+        """Return the k closest (name, distance) pairs across all healthy shards"""
+        query = np.asarray(encoding, dtype=np.float64)
+        start_time = time.perf_counter()
+
+        # Scatter
+        pending = {}
+        for index in self._healthy():
+            conn = self.shards[index]['conn']
+            try:
+                conn.send(("search", (query, k)))
+                pending[conn] = index
+            except (EOFError, OSError) as e:
+                self._mark_failed(index, str(e) or type(e).__name__)
+
+        # Gather in completion order so each shard's latency is its own
+        results = []
+        deadline = start_time + self.timeout
+        while pending:
+            remaining = deadline - time.perf_counter()
+            ready = wait(list(pending), timeout=max(remaining, 0))
+            if not ready:
+                # The connection can't be reused once a reply is outstanding
+                for index in pending.values():
+                    self._mark_failed(index, "timed out")
+                break
+
+            for conn in ready:
+                index = pending.pop(conn)
+                try:
+                    reply = conn.recv()
+                except (EOFError, OSError) as e:
+                    self._mark_failed(index, str(e) or type(e).__name__)
+                    continue
+                if isinstance(reply, ShardError):
+                    self._rejected(index, reply)
+                    continue
+                results.extend(reply)
+                latency = time.perf_counter() - start_time
+                shard = self.shards[index]
+                shard['queries'] += 1
+                shard['total_latency'] += latency
+                shard['max_latency'] = max(shard['max_latency'], latency)
+
+        return sorted(results, key=lambda match: match[1])[:k]
+
+    def shard_stats(self):
+        """Per-shard health, identity counts and search latency"""
+        return [{
+            'shard': index,
+            'address': shard['address'],
+            'healthy': shard['healthy'],
+            'identities': len(shard['identities']),
+            'queries': shard['queries'],
+            'failures': shard['failures'],
+            'avg_latency': shard['total_latency'] / shard['queries'] if shard['queries'] else 0,
+            'max_latency': shard['max_latency']
+        } for index, shard in enumerate(self.shards)]
+
+    def close(self):
+        """Stop local shards and disconnect from remote ones"""
+        for index, shard in enumerate(self.shards):
+            try:
+                if shard['process'] is not None:
+                    if shard['healthy']:
+                        shard['conn'].send(("stop", None))
+                    else:
+                        shard['process'].terminate()
+                    shard['process'].join(timeout=5)
+                shard['conn'].close()
+            except (EOFError, OSError):
+                pass
+        self.shards = []
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a gallery shard node")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6000)
+    args = parser.parse_args()
+
+    authkey = os.environ.get("GALLERY_AUTHKEY", "").encode()
+    if not authkey:
+        parser.error("set GALLERY_AUTHKEY to the key shared with the gallery")
+    serve_shard((args.host, args.port), authkey)
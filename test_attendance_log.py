@@ -0,0 +1,165 @@
+import csv
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+import attendance_log
+import database_operations
+from attendance_log import AttendanceLog
+
+
+def read_rows(path):
+    with open(path, newline='') as f:
+        return list(csv.reader(f))[1:]
+
+
+class FakeClock:
+    """Stands in for datetime in attendance_log so tests control the date"""
+
+    def __init__(self, now):
+        self.current = now
+
+    def now(self):
+        return self.current
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock(datetime(2026, 3, 2, 9, 0, 0))
+    monkeypatch.setattr(attendance_log, "datetime", fake)
+    return fake
+
+
+def test_restart_does_not_record_twice(tmp_path, clock):
+    log = AttendanceLog(tmp_path, flush_interval=60)
+    assert log.record("alice")
+    assert not log.record("alice")
+    log.close()
+
+    log = AttendanceLog(tmp_path, flush_interval=60)
+    assert not log.record("alice")
+    assert log.record("bob")
+    log.close()
+
+    rows = read_rows(tmp_path / "attendance_2026-03-02.csv")
+    assert [row[0] for row in rows] == ["alice", "bob"]
+
+
+def test_index_rebuilt_from_existing_csv(tmp_path, clock):
+    with open(tmp_path / "attendance_2026-03-02.csv", 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Name', 'Date', 'Time'])
+        writer.writerow(['carol', '2026-03-02', '08:55:00'])
+
+    log = AttendanceLog(tmp_path, flush_interval=60)
+    assert not log.record("carol")
+    log.close()
+
+    with open(tmp_path / "attendance_2026-03-02.idx") as f:
+        assert f.read().split() == ["carol"]
+
+
+def test_day_rotation_starts_new_file(tmp_path, clock):
+    log = AttendanceLog(tmp_path, flush_interval=60)
+    assert log.record("alice")
+
+    clock.current = datetime(2026, 3, 3, 9, 0, 0)
+    assert log.record("alice")
+    log.close()
+
+    assert [r[0] for r in read_rows(tmp_path / "attendance_2026-03-02.csv")] == ["alice"]
+    assert [r[0] for r in read_rows(tmp_path / "attendance_2026-03-03.csv")] == ["alice"]
+
+
+def test_session_rotation_is_keyed_by_session(tmp_path, clock):
+    log = AttendanceLog(tmp_path, rotation="session", session_key="CS101-wk3", flush_interval=60)
+    assert log.record("alice")
+    log.close()
+
+    log = AttendanceLog(tmp_path, rotation="session", session_key="CS101-wk3", flush_interval=60)
+    assert not log.record("alice")
+    log.close()
+
+    log = AttendanceLog(tmp_path, rotation="session", session_key="CS101-wk4", flush_interval=60)
+    assert log.record("alice")
+    log.close()
+
+    assert os.path.exists(tmp_path / "attendance_CS101-wk3.csv")
+    assert os.path.exists(tmp_path / "attendance_CS101-wk4.csv")
+
+
+def test_invalid_session_keys_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        AttendanceLog(tmp_path, rotation="session")
+    with pytest.raises(ValueError):
+        AttendanceLog(tmp_path, rotation="session", session_key="../escape")
+    with pytest.raises(ValueError):
+        AttendanceLog(tmp_path, rotation="session", session_key="x" * 51)
+
+
+def test_full_buffer_flushes_early(tmp_path, clock):
+    log = AttendanceLog(tmp_path, flush_interval=60, max_buffer=3)
+    csv_path = tmp_path / "attendance_2026-03-02.csv"
+    try:
+        for name in ["a", "b", "c"]:
+            log.record(name)
+
+        # Well before flush_interval, the background thread writes the batch
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            if os.path.exists(csv_path) and len(read_rows(csv_path)) == 3:
+                break
+            time.sleep(0.01)
+        assert len(read_rows(csv_path)) == 3
+    finally:
+        log.close()
+
+
+def test_failed_mirror_is_retried(tmp_path, clock, monkeypatch):
+    saved = []
+    failures = [True]
+
+    def fake_save(records):
+        if failures and failures.pop(0):
+            return False
+        saved.extend(records)
+        return True
+
+    monkeypatch.setattr(database_operations, "save_attendance_records", fake_save)
+    log = AttendanceLog(tmp_path, flush_interval=60, mirror_to_db=True)
+    try:
+        log.record("alice")
+        log.flush()
+        assert saved == [] and log.unmirrored_count() == 1
+
+        log.flush()
+        assert [name for name, _, _ in saved] == ["alice"]
+        assert log.unmirrored_count() == 0
+    finally:
+        log.close()
+
+
+def test_failing_batch_does_not_block_later_ones(tmp_path, clock, monkeypatch):
+    saved = []
+
+    def fake_save(records):
+        if any(name == "bad" for name, _, _ in records):
+            return False
+        saved.extend(records)
+        return True
+
+    monkeypatch.setattr(database_operations, "save_attendance_records", fake_save)
+    log = AttendanceLog(tmp_path, flush_interval=60, mirror_to_db=True, max_mirror_attempts=2)
+    try:
+        log.record("bad")
+        log.flush()
+        log.record("good")
+        log.flush()
+        assert [name for name, _, _ in saved] == ["good"]
+
+        # The bad batch has now failed twice and is dropped
+        assert log.unmirrored_count() == 0
+    finally:
+        log.close()
@@ -0,0 +1,106 @@
+import pytest
+
+from frame_scheduler import FrameScheduler
+
+
+def run(scheduler, start, seconds, latency=0.0, step=0.001):
+    """Offer a frame every step seconds; work finishes instantly. Returns dispatch times."""
+    dispatched = []
+    for i in range(int(seconds / step)):
+        now = start + i * step
+        if scheduler.should_process(now):
+            dispatched.append(now - start)
+            scheduler.task_done(latency)
+    return dispatched
+
+
+def measure(scheduler, latency):
+    """Dispatch one frame that took latency seconds"""
+    assert scheduler.should_process(scheduler.start_time)
+    scheduler.task_done(latency)
+
+
+def test_fixed_policy_paces_at_target_fps():
+    scheduler = FrameScheduler(policy="fixed", target_fps=4.0)
+    dispatched = run(scheduler, scheduler.start_time, 1.0, latency=0.5)
+    assert dispatched == pytest.approx([0.0, 0.25, 0.5, 0.75], abs=0.002)
+
+
+def test_adaptive_rate_follows_latency_and_utilization():
+    scheduler = FrameScheduler(policy="adaptive", target_utilization=0.5)
+    now = scheduler.start_time
+
+    # No latency measured yet, so the target rate applies
+    assert scheduler.current_interval(now) == pytest.approx(1 / 3.0)
+
+    measure(scheduler, 0.5)
+    # rate = 0.5 * 1 worker / 0.5 s = 1 fps
+    assert scheduler.current_interval(now) == pytest.approx(1.0)
+
+
+def test_adaptive_rate_backs_off_while_work_is_in_flight():
+    scheduler = FrameScheduler(policy="adaptive", max_in_flight=2, target_utilization=0.5)
+    now = scheduler.start_time
+    measure(scheduler, 0.5)
+    assert scheduler.current_interval(now) == pytest.approx(0.5)
+
+    assert scheduler.should_process(now + 1)
+    assert scheduler.current_interval(now + 1) == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize("latency, interval", [(100.0, 1 / 0.5), (0.001, 1 / 10.0)])
+def test_adaptive_rate_is_clamped(latency, interval):
+    scheduler = FrameScheduler(policy="adaptive", min_fps=0.5, max_fps=10.0)
+    measure(scheduler, latency)
+    assert scheduler.current_interval(scheduler.start_time) == pytest.approx(interval)
+
+
+def test_busy_worker_blocks_dispatch_until_boost():
+    scheduler = FrameScheduler(policy="fixed", target_fps=3.0, boost_workers=1)
+    now = scheduler.start_time
+    assert scheduler.should_process(now)
+    assert not scheduler.should_process(now + 5)
+
+    scheduler.boost(now + 5)
+    assert scheduler.should_process(now + 5)
+    assert not scheduler.should_process(now + 10)
+
+
+def test_boost_expires():
+    scheduler = FrameScheduler(policy="adaptive", boost_fps=6.0, boost_duration=2.0)
+    measure(scheduler, 0.5)
+    now = scheduler.start_time + 10
+
+    scheduler.boost(now)
+    assert scheduler.workers(now + 1.9) == 2
+    assert scheduler.current_interval(now + 1.9) == pytest.approx(1 / 6.0)
+
+    assert scheduler.workers(now + 2.0) == 1
+    assert scheduler.current_interval(now + 2.0) == pytest.approx(1.0)
+
+
+def test_boosted_seconds_merges_overlapping_boosts():
+    scheduler = FrameScheduler(boost_duration=2.0)
+    start = scheduler.start_time
+    scheduler.boost(start)
+    scheduler.boost(start + 1)  # Extends the window to start + 3
+    scheduler.boost(start + 5)
+    assert scheduler.boosted_seconds(start + 6) == pytest.approx(4.0)
+
+
+def test_utilization_counts_boost_workers_only_while_boosted():
+    scheduler = FrameScheduler(policy="fixed", target_fps=3.0, max_in_flight=1,
+                               boost_workers=1, boost_duration=2.0)
+    start = scheduler.start_time
+    scheduler.boost(start)
+
+    # Both workers busy through the 2 s boost, then one worker until 4 s
+    assert scheduler.should_process(start)
+    assert scheduler.should_process(start + 0.2)
+    scheduler.task_done(2.0)
+    scheduler.task_done(1.8)
+    assert scheduler.should_process(start + 2.0)
+    scheduler.task_done(2.0)
+
+    # 5.8 busy worker-seconds out of 4 s * 1 worker + 2 s * 1 boost worker
+    assert scheduler.stats(start + 4)['worker_utilization'] == pytest.approx(5.8 / 6 * 100)
@@ -0,0 +1,161 @@
+import multiprocessing as mp
+import socket
+
+import numpy as np
+import pytest
+
+from gallery_shards import ShardedGallery, serve_shard
+
+AUTHKEY = b"test-only-key"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def remote_shard():
+    """A serve_shard node running in a local process"""
+    address = ("127.0.0.1", free_port())
+    ready = mp.Event()
+    process = mp.Process(target=serve_shard, args=(address, AUTHKEY, ready), daemon=True)
+    process.start()
+    assert ready.wait(10)
+    yield address
+    process.terminate()
+    process.join(5)
+
+
+@pytest.fixture
+def faces():
+    rng = np.random.default_rng(0)
+    names = [f"person_{i}" for i in range(60)]
+    return names, rng.normal(size=(len(names), 128))
+
+
+def brute_force(names, encodings, query, k):
+    distances = np.linalg.norm(encodings - query, axis=1)
+    return [(names[i], distances[i]) for i in np.argsort(distances)[:k]]
+
+
+def test_merged_top_k_matches_brute_force(remote_shard, faces):
+    names, encodings = faces
+    gallery = ShardedGallery(2, [remote_shard], AUTHKEY)
+    try:
+        gallery.add(names, encodings)
+        queries = np.random.default_rng(1).normal(size=(10, 128))
+        for query in list(queries) + [encodings[7] + 0.01]:
+            results = gallery.search(query, k=5)
+            expected = brute_force(names, encodings, query, 5)
+            assert [name for name, _ in results] == [name for name, _ in expected]
+            assert np.allclose([d for _, d in results], [d for _, d in expected])
+
+        stats = gallery.shard_stats()
+        assert [stat['address'] for stat in stats] == ["local", "local", remote_shard]
+        assert all(stat['queries'] == 11 and stat['failures'] == 0 for stat in stats)
+    finally:
+        gallery.close()
+
+
+def test_rebalance_after_add_shard(remote_shard, faces):
+    names, encodings = faces
+    gallery = ShardedGallery(1, authkey=AUTHKEY)
+    try:
+        gallery.add(names, encodings)
+        gallery.add_shard(remote_shard)
+        gallery.add_shard()
+
+        sizes = [stat['identities'] for stat in gallery.shard_stats()]
+        assert sum(sizes) == len(names)
+        assert max(sizes) - min(sizes) <= 1
+
+        # Every identity is still found after being moved
+        for name, encoding in zip(names, encodings):
+            assert gallery.search(encoding, k=1)[0][0] == name
+    finally:
+        gallery.close()
+
+
+def test_dead_shard_returns_partial_results(faces):
+    names, encodings = faces
+    gallery = ShardedGallery(3, timeout=1.0)
+    try:
+        gallery.add(names, encodings)
+        dead = gallery.shards[0]
+        dead['process'].kill()
+        dead['process'].join(5)
+
+        results = gallery.search(encodings[0], k=3)
+        survivors = set().union(*(shard['identities'] for shard in gallery.shards[1:]))
+        expected = [(n, d) for n, d in brute_force(names, encodings, encodings[0], len(names))
+                    if n in survivors][:3]
+        assert [name for name, _ in results] == [name for name, _ in expected]
+
+        stats = gallery.shard_stats()
+        assert not stats[0]['healthy'] and stats[0]['failures'] == 1
+        assert all(stat['healthy'] for stat in stats[1:])
+    finally:
+        gallery.close()
+
+
+def test_failed_move_during_rebalance_keeps_identities(faces, monkeypatch):
+    names, encodings = faces
+    names, encodings = names[:10], encodings[:10]
+    gallery = ShardedGallery(1, timeout=1.0)
+    try:
+        gallery.add(names, encodings)
+
+        # Add a second shard without rebalancing, then kill it
+        monkeypatch.setattr(gallery, "rebalance", lambda: None)
+        gallery.add_shard()
+        monkeypatch.undo()
+        broken = gallery.shards[1]
+        broken['process'].kill()
+        broken['process'].join(5)
+
+        gallery.rebalance()
+
+        stats = gallery.shard_stats()
+        assert stats[0]['healthy'] and stats[0]['identities'] == 10
+        assert not stats[1]['healthy']
+        for name, encoding in zip(names, encodings):
+            assert gallery.search(encoding, k=1)[0][0] == name
+    finally:
+        gallery.close()
+
+
+def test_bad_request_gets_error_reply_and_node_keeps_serving(remote_shard, faces):
+    names, encodings = faces
+    gallery = ShardedGallery(0, [remote_shard], AUTHKEY)
+    try:
+        gallery.add(names, encodings)
+
+        # Wrong-length query is rejected, the shard stays up
+        assert gallery.search(np.zeros(3), k=1) == []
+        stats = gallery.shard_stats()[0]
+        assert stats['healthy'] and stats['failures'] == 1
+        assert gallery.search(encodings[4], k=1)[0][0] == names[4]
+
+        # Wrong-length encodings are not added or counted
+        gallery.add(["odd_one"], [np.zeros(3)])
+        assert "odd_one" not in gallery.locations
+        assert gallery.shard_stats()[0]['identities'] == len(names)
+    finally:
+        gallery.close()
+
+
+def test_search_without_shards_returns_empty():
+    gallery = ShardedGallery(1)
+    try:
+        assert gallery.search(np.zeros(128), k=1) == []
+    finally:
+        gallery.close()
+
+
+def test_remote_shard_requires_authkey(remote_shard):
+    with pytest.raises(ValueError):
+        ShardedGallery(0, [remote_shard])
+    with pytest.raises(ValueError):
+        serve_shard(("127.0.0.1", free_port()), None)